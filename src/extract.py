@@ -0,0 +1,121 @@
+import time
+import asyncio
+import httpx
+import orjson
+
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+
+def make_client(api_key):
+    # HTTP/2 multiplexes the concurrent requests over a single connection
+    return httpx.AsyncClient(
+        http2=True,
+        headers={"X-Api-Key": api_key},
+        limits=httpx.Limits(max_connections=16, max_keepalive_connections=16),
+        timeout=60,
+    )
+
+
+def reset_after(headers, default):
+    """
+    Seconds until the API's rate-limit bucket refills, read from whichever
+    reset header the response carries. X-RateLimit-Reset may be an epoch.
+    """
+    for name in ("X-RateLimit-Reset-After", "Retry-After", "X-RateLimit-Reset"):
+        value = headers.get(name)
+        if value is None:
+            continue
+        try:
+            seconds = float(value)
+        except ValueError:
+            continue
+        if seconds > 1e9:
+            seconds -= time.time()
+        return max(seconds, 0.0)
+    return default
+
+
+class RateLimiter:
+    """
+    Caps in-flight requests and holds back new ones while the API reports an
+    empty bucket (X-RateLimit-Remaining: 0) or after a 429.
+    """
+
+    def __init__(self, max_concurrency=8, default_wait=60.0):
+        self.max_concurrency = max_concurrency
+        self.default_wait = default_wait
+        self.remaining = None
+        self.resume_at = 0.0
+        self._sem = None
+
+    def wait_time(self):
+        return max(self.resume_at - time.monotonic(), 0.0)
+
+    def update(self, status, headers):
+        remaining = headers.get("X-RateLimit-Remaining")
+        if remaining is not None:
+            self.remaining = int(remaining)
+        if status == 429 or self.remaining == 0:
+            resume_at = time.monotonic() + reset_after(headers, self.default_wait)
+            self.resume_at = max(self.resume_at, resume_at)
+
+    async def __aenter__(self):
+        if self._sem is None:
+            self._sem = asyncio.Semaphore(self.max_concurrency)
+        await self._sem.acquire()
+        while (delay := self.wait_time()) > 0:
+            await asyncio.sleep(delay)
+        return self
+
+    async def __aexit__(self, *exc):
+        self._sem.release()
+
+
+async def get_json(client, url, params, limiter, retries=5, backoff=0.5):
+    """
+    GET url with the shared httpx client and return the decoded JSON body.
+    Requests go through the limiter; 429/5xx responses are retried with
+    exponential backoff.
+    """
+    for attempt in range(retries + 1):
+        async with limiter:
+            resp = await client.get(url, params=params)
+            limiter.update(resp.status_code, resp.headers)
+        if resp.status_code not in RETRY_STATUSES or attempt == retries:
+            if resp.status_code >= 400:
+                print("Status:", resp.status_code)
+                print("Response (first 500 chars):", resp.content[:500].decode(errors="replace"))
+            resp.raise_for_status()
+            return orjson.loads(resp.content)
+        await asyncio.sleep(backoff * 2 ** attempt)
+
+
+async def fetch_pages(url, api_key, per_page=100, max_pages=5):
+    """
+    For page-numbered endpoints. Yields each page's results as it arrives.
+    Page 1 tells us how many pages exist; the rest are fetched concurrently.
+    """
+    params = {"per_page": per_page, "page": 1}
+    limiter = RateLimiter(max_concurrency=8)
+    async with make_client(api_key) as client:
+        data = await get_json(client, url, params, limiter)
+        results = data.get("results", [])
+        if not results:
+            return
+        yield results
+
+        pages = min((data.get("pagination") or {}).get("pages") or 1, max_pages)
+        tasks = [
+            asyncio.create_task(get_json(client, url, {**params, "page": page}, limiter))
+            for page in range(2, pages + 1)
+        ]
+        try:
+            for next_page in asyncio.as_completed(tasks):
+                results = (await next_page).get("results", [])
+                if results:
+                    yield results
+        finally:
+            # Stop the remaining pages before the client closes under them
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
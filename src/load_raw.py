@@ -0,0 +1,197 @@
+import io
+import os
+import uuid
+import asyncio
+import orjson
+from dotenv import load_dotenv
+import snowflake.connector
+
+load_dotenv()
+
+# Snowflake credentials are read from the environment once, at import
+_SF_ENV = {
+    "account": "SNOWFLAKE_ACCOUNT",
+    "user": "SNOWFLAKE_USER",
+    "password": "SNOWFLAKE_PASSWORD",
+    "role": "SNOWFLAKE_ROLE",
+    "warehouse": "SNOWFLAKE_WAREHOUSE",
+    "database": "SNOWFLAKE_DATABASE",
+}
+_SF_KWARGS = {key: os.getenv(var) for key, var in _SF_ENV.items()}
+
+_missing = [_SF_ENV[key] for key, value in _SF_KWARGS.items() if not value]
+if _missing:
+    raise RuntimeError(f"Missing {', '.join(_missing)} in .env")
+
+# Connections use qmark binding, so the array travels as a server-side bind
+# rather than inside the SQL text, up to the 16 MB VARCHAR limit
+FLATTEN_MAX_BYTES = 16 * 1024 * 1024
+
+# Flush once a batch's JSON reaches ~12 MB: large enough to amortize the
+# round-trip, with headroom under the 16 MB limit above
+BATCH_BYTES = 12 * 1024 * 1024
+BATCH_MAX_ROWS = 50_000
+
+
+def sf_conn(schema="RAW"):
+    return snowflake.connector.connect(
+        **_SF_KWARGS,
+        schema=schema,
+        autocommit=False,
+        paramstyle="qmark",
+    )
+
+
+class RawBatcher:
+    """
+    Accumulates payload rows for one RAW table and flushes them once the
+    serialized batch reaches `max_bytes` (or `max_rows`), so batch size follows
+    payload size instead of a fixed row count. Schedule A rows are several times
+    larger than candidate rows.
+    The last of `columns` is the VARIANT payload; the others take `constants`,
+    which are the same for every row of a run (ingest_ts, source, ...) and are
+    sent once per statement instead of being repeated in every serialized row.
+    A flush that fits in one bind goes in a single INSERT ... FLATTEN; anything
+    bigger is staged and COPY'd.
+    """
+
+    def __init__(
+        self, cur, table, columns, constants, max_bytes=BATCH_BYTES, max_rows=BATCH_MAX_ROWS
+    ):
+        self.cur = cur
+        self.table = table
+        self.columns = columns
+        self.constants = constants
+        self.max_bytes = max_bytes
+        self.max_rows = max_rows
+        self._parts = []
+        self._bytes = 0
+        self._rows = 0
+
+    def add(self, rows):
+        """
+        Returns the number of rows loaded by this call (0 unless it flushed).
+        """
+        if not rows:
+            return 0
+
+        # One orjson call per page; keep the array's inner bytes for joining
+        part = orjson.dumps(rows)[1:-1]
+        self._parts.append(part)
+        self._bytes += len(part) + 1
+        self._rows += len(rows)
+
+        if self._bytes >= self.max_bytes or self._rows >= self.max_rows:
+            return self.flush()
+        return 0
+
+    def flush(self):
+        """
+        Load whatever is buffered. Returns the number of rows loaded.
+        """
+        if not self._parts:
+            return 0
+
+        body = b"[" + b",".join(self._parts) + b"]"
+        self._parts = []
+        self._bytes = 0
+        self._rows = 0
+
+        if len(body) <= FLATTEN_MAX_BYTES:
+            return insert_flatten(self.cur, self.table, self.columns, self.constants, body)
+        return copy_via_stage(self.cur, self.table, self.columns, self.constants, body)
+
+
+def _sql_literal(value):
+    return "'" + str(value).replace("\\", "\\\\").replace("'", "''") + "'"
+
+
+def insert_flatten(cur, table, columns, constants, body):
+    """
+    One statement and one PARSE_JSON of the outer array; FLATTEN fans it out into rows.
+    """
+    cur.execute(
+        f"""
+        INSERT INTO {table} ({", ".join(columns)})
+        SELECT {"?, " * len(constants)}value
+        FROM TABLE(FLATTEN(INPUT => PARSE_JSON(?)))
+        """,
+        (*constants, body.decode()),
+    )
+    return cur.rowcount
+
+
+def copy_via_stage(cur, table, columns, constants, body):
+    """
+    Bulk load through the table stage (PUT + COPY INTO), uploading the JSON array
+    straight from memory. The payload lands as VARIANT while the file is read,
+    without a PARSE_JSON pass over every row. COPY takes no binds, so the
+    constants go in as escaped literals.
+    """
+    schema, name = table.split(".")
+    stage = f"@{schema}.%{name}"
+    filename = f"{name}_{uuid.uuid4().hex}.json"
+
+    cur.execute(
+        f"PUT 'file://{filename}' {stage} AUTO_COMPRESS=TRUE OVERWRITE=TRUE",
+        file_stream=io.BytesIO(body),
+    )
+    select = ", ".join([_sql_literal(value) for value in constants] + ["$1"])
+    cur.execute(
+        f"""
+        COPY INTO {table} ({", ".join(columns)})
+        FROM (SELECT {select} FROM {stage})
+        FILES = ('{filename}.gz')
+        FILE_FORMAT = (TYPE = JSON STRIP_OUTER_ARRAY = TRUE)
+        PURGE = TRUE
+        """
+    )
+    # COPY returns one row per file: (file, status, rows_parsed, rows_loaded, ...)
+    return sum(row[3] for row in cur.fetchall())
+
+
+async def stream_to_loader(pages, load_batch, maxsize=4):
+    """
+    Pipe an async iterator of page batches into load_batch, which runs on a
+    worker thread (the Snowflake connector is blocking) while the next pages
+    are still being fetched. At most `maxsize` pages are buffered, so memory
+    stays flat no matter how many pages the API returns.
+    Returns the sum of load_batch's return values.
+    """
+    queue = asyncio.Queue(maxsize=maxsize)
+
+    async def produce():
+        try:
+            async for batch in pages:
+                await queue.put(batch)
+        finally:
+            # Run the fetcher's cleanup now, even if we were stopped mid-put
+            await pages.aclose()
+        await queue.put(None)
+
+    # The worker thread can't be interrupted, so keep a handle on the batch it's
+    # loading; on error we wait for it before the caller closes the cursor
+    in_flight = None
+
+    async def consume():
+        nonlocal in_flight
+        loaded = 0
+        while (batch := await queue.get()) is not None:
+            in_flight = asyncio.ensure_future(asyncio.to_thread(load_batch, batch))
+            loaded += await asyncio.shield(in_flight)
+        return loaded
+
+    producer = asyncio.create_task(produce())
+    consumer = asyncio.create_task(consume())
+    try:
+        await asyncio.gather(producer, consumer)
+    except BaseException:
+        producer.cancel()
+        consumer.cancel()
+        await asyncio.gather(producer, consumer, return_exceptions=True)
+        if in_flight is not None:
+            await asyncio.wait([in_flight])
+            if not in_flight.cancelled():
+                in_flight.exception()  # retrieved; the original error is re-raised
+        raise
+    return consumer.result()
@@ -1,9 +1,11 @@
 import os
-import json
-import requests
+import asyncio
+import itertools
 from datetime import datetime, timezone, timedelta
 from dotenv import load_dotenv
-import snowflake.connector
+
+from extract import RateLimiter, get_json, make_client
+from load_raw import RawBatcher, sf_conn, stream_to_loader
 
 load_dotenv()
 
@@ -12,50 +14,38 @@ BASE = "https://api.open.fec.gov/v1"
 ENDPOINT = "/schedules/schedule_a/"
 SOURCE = "openfec"
 
-
-def sf_conn(schema="CONTROL"):
-    return snowflake.connector.connect(
-        account=os.getenv("SNOWFLAKE_ACCOUNT"),
-        user=os.getenv("SNOWFLAKE_USER"),
-        password=os.getenv("SNOWFLAKE_PASSWORD"),
-        role=os.getenv("SNOWFLAKE_ROLE"),
-        warehouse=os.getenv("SNOWFLAKE_WAREHOUSE"),
-        database=os.getenv("SNOWFLAKE_DATABASE"),
-        schema=schema,
-    )
+# Schedule A is walked as SHARDS concurrent load_date ranges
+SHARDS = 8
 
 
-def get_last_watermark():
+def get_last_watermark(conn):
     """
     We store a watermark in CONTROL.ingest_runs.
     For Schedule A, we use LOAD_DATE as our incremental watermark.
     """
-    conn = sf_conn(schema="CONTROL")
-    cur = conn.cursor()
-    try:
+    with conn.cursor() as cur:
         cur.execute(
             """
             SELECT COALESCE(MAX(last_indexed_date), '1900-01-01'::TIMESTAMP_NTZ)
             FROM CONTROL.ingest_runs
-            WHERE source = %s AND endpoint = %s AND status = 'SUCCESS'
+            WHERE source = ? AND endpoint = ? AND status = 'SUCCESS'
             """,
             (SOURCE, ENDPOINT),
         )
         return cur.fetchone()[0]
-    finally:
-        cur.close()
-        conn.close()
 
 
-def log_run(status, watermark, rows_loaded, notes=""):
-    conn = sf_conn(schema="CONTROL")
-    cur = conn.cursor()
-    try:
+def log_run(conn, status, watermark, rows_loaded, notes=""):
+    """
+    Does not commit: the caller commits once, so a SUCCESS row and the RAW rows
+    it describes become visible together.
+    """
+    with conn.cursor() as cur:
         cur.execute(
             """
             INSERT INTO CONTROL.ingest_runs
               (source, endpoint, last_indexed_date, last_run_ts, status, rows_loaded, notes)
-            VALUES (%s, %s, %s, %s, %s, %s, %s)
+            VALUES (?, ?, ?, ?, ?, ?, ?)
             """,
             (
                 SOURCE,
@@ -67,46 +57,42 @@ def log_run(status, watermark, rows_loaded, notes=""):
                 notes,
             ),
         )
-        conn.commit()
-    finally:
-        cur.close()
-        conn.close()
 
 
-def fetch_schedule_a_keyset(min_load_date, per_page=100, max_batches=5):
+def load_date_shards(min_load_date, shards):
+    """
+    Split [min_load_date, today] into up to `shards` day ranges, returned as
+    (min_load_date, max_load_date) pairs. load_date is a timestamp while the
+    bounds are dates, so neighbouring shards share their boundary day (sub_id
+    dedup absorbs the overlap) and the last shard has no upper bound at all.
+    """
+    start = min_load_date.date()
+    days = max((datetime.now().date() - start).days + 1, 1)
+    shards = max(min(shards, days), 1)
+    bounds = [start + timedelta(days=days * i // shards) for i in range(shards)]
+    return list(zip(bounds, bounds[1:] + [None]))
+
+
+async def walk_keyset(client, limiter, params):
     """
     KEYSET pagination for /schedules/schedule_a/
     DO NOT use page=1,2,3... for this endpoint.
     We use the response pagination.last_indexes to request the next batch.
+    Yields each batch's results until the range is exhausted: the walk is
+    sorted by contribution_receipt_date, not load_date, so stopping early would
+    leave no safe point to resume from.
     """
-    headers = {"X-Api-Key": API_KEY}
-    rows = []
+    params = dict(params)
 
-    # Start params (no "page")
-    # Note: Schedule A API requires two_year_transaction_period or specific filters
-    current_year = datetime.now().year
-    params = {
-        "per_page": per_page,
-        "sort": "contribution_receipt_date",
-        "min_load_date": min_load_date.strftime("%Y-%m-%d"),
-        "two_year_transaction_period": current_year,
-    }
-
-    for batch_num in range(1, max_batches + 1):
+    for batch_num in itertools.count(1):
         print(f"Batch {batch_num} params:", params)
 
-        r = requests.get(BASE + ENDPOINT, headers=headers, params=params, timeout=60)
-        if r.status_code != 200:
-            print("Status:", r.status_code)
-            print("Response (first 500 chars):", r.text[:500])
-        r.raise_for_status()
-
-        data = r.json()
+        data = await get_json(client, BASE + ENDPOINT, params, limiter)
         results = data.get("results", [])
         if not results:
             break
 
-        rows.extend(results)
+        yield results
 
         # Keyset pagination
         last_indexes = (data.get("pagination") or {}).get("last_indexes") or {}
@@ -116,34 +102,109 @@ def fetch_schedule_a_keyset(min_load_date, per_page=100, max_batches=5):
         # Update params with returned keyset fields (e.g., last_index, last_load_date, etc.)
         params.update(last_indexes)
 
-    return rows
-
 
-def insert_raw_schedule_a(rows, commit_every=500):
-    if not rows:
-        print("No rows to insert.")
-        return 0
+async def fetch_schedule_a_pages(min_load_date, per_page=100, shards=SHARDS):
+    """
+    Keyset walks can't be parallelized page by page, so the load_date window is
+    split into shards and each shard is walked independently, all concurrently.
+    Batches are yielded as they arrive from any shard, deduplicated by sub_id
+    (the unique Schedule A line id).
+    """
+    # Start params (no "page")
+    # Note: Schedule A API requires two_year_transaction_period or specific filters
+    current_year = datetime.now().year
+    params = {
+        "per_page": per_page,
+        "sort": "contribution_receipt_date",
+        "two_year_transaction_period": current_year,
+    }
 
+    # About one batch per shard in flight; walks wait here while the loader catches up
+    batches = asyncio.Queue(maxsize=shards)
+
+    async def walk(client, limiter, shard_params):
+        async for results in walk_keyset(client, limiter, shard_params):
+            await batches.put(results)
+
+    limiter = RateLimiter(max_concurrency=8)
+    async with make_client(API_KEY) as client:
+        walks = [
+            asyncio.create_task(
+                walk(
+                    client,
+                    limiter,
+                    {
+                        **params,
+                        "min_load_date": lo.strftime("%Y-%m-%d"),
+                        **({"max_load_date": hi.strftime("%Y-%m-%d")} if hi else {}),
+                    },
+                )
+            )
+            for lo, hi in load_date_shards(min_load_date, shards)
+        ]
+
+        async def close_when_done():
+            # None marks the end of the stream, whether the walks finished or failed
+            try:
+                await asyncio.gather(*walks)
+            except Exception:
+                await batches.put(None)
+                raise
+            await batches.put(None)
+
+        closer = asyncio.create_task(close_when_done())
+
+        seen = set()
+        try:
+            while (results := await batches.get()) is not None:
+                rows = []
+                for row in results:
+                    sub_id = row.get("sub_id")
+                    if sub_id is not None:
+                        if sub_id in seen:
+                            continue
+                        seen.add(sub_id)
+                    rows.append(row)
+                if rows:
+                    yield rows
+            # Surface any shard failure
+            await closer
+        finally:
+            # Stop the other walks before the client closes under them
+            for task in (closer, *walks):
+                task.cancel()
+            await asyncio.gather(closer, *walks, return_exceptions=True)
+
+
+async def load_schedule_a(conn, watermark):
+    """
+    Stream Schedule A batches into RAW while later batches are still being
+    fetched. Nothing is committed here.
+    Returns (fetched, inserted, new_watermark).
+    """
     ingest_ts = datetime.now(timezone.utc).replace(tzinfo=None)
+    fetched = 0
+    new_watermark = watermark
+
+    with conn.cursor() as cur:
+        batcher = RawBatcher(
+            cur,
+            "RAW.raw_schedule_a",
+            ("ingest_ts", "source", "endpoint", "payload"),
+            (ingest_ts, SOURCE, ENDPOINT),
+        )
 
-    conn = sf_conn(schema="RAW")
-    cur = conn.cursor()
-    sql = """
-    INSERT INTO RAW.raw_schedule_a (ingest_ts, source, endpoint, payload)
-    SELECT %s, %s, %s, PARSE_JSON(%s)
-    """
-    try:
-        inserted = 0
-        for i, row in enumerate(rows, start=1):
-            cur.execute(sql, (ingest_ts, SOURCE, ENDPOINT, json.dumps(row)))
-            inserted += 1
-            if i % commit_every == 0:
-                conn.commit()
-        conn.commit()
-        return inserted
-    finally:
-        cur.close()
-        conn.close()
+        def load(rows):
+            nonlocal fetched, new_watermark
+            fetched += len(rows)
+            # Update watermark to latest load_date from fetched rows
+            new_watermark = max(new_watermark, compute_new_watermark(rows, new_watermark))
+            return batcher.add(rows)
+
+        pages = fetch_schedule_a_pages(min_load_date=watermark, per_page=100)
+        inserted = await stream_to_loader(pages, load)
+        inserted += batcher.flush()
+    return fetched, inserted, new_watermark
 
 
 def compute_new_watermark(rows, fallback):
@@ -156,7 +217,14 @@ def compute_new_watermark(rows, fallback):
     if not load_dates:
         return fallback
 
-    # Convert to datetime for robust max, then return datetime (timestamp_ntz)
+    # ISO-8601 strings of one shape sort chronologically, so take the max as a
+    # string and parse just that one (returned as datetime for timestamp_ntz)
+    try:
+        return datetime.fromisoformat(max(load_dates))
+    except (TypeError, ValueError):
+        pass
+
+    # Something odd in the batch: parse each value and skip the bad ones
     parsed = []
     for s in load_dates:
         try:
@@ -173,29 +241,34 @@ if __name__ == "__main__":
     if not API_KEY:
         raise RuntimeError("Missing OPENFEC_API_KEY in .env")
 
-    # 1) Get watermark from CONTROL
-    watermark = get_last_watermark()
-    print(f"Last successful watermark: {watermark}")
+    # One Snowflake session for the whole run; every table below is fully qualified.
+    # Leaving the block cleanly commits the RAW rows and the SUCCESS row together.
+    with sf_conn() as conn:
+        # 1) Get watermark from CONTROL
+        watermark = get_last_watermark(conn)
+        print(f"Last successful watermark: {watermark}")
 
-    # 2) First run fallback (OpenFEC can reject extremely old filters or it may be too huge)
-    if str(watermark).startswith("1900-01-01"):
-        watermark = (datetime.now(timezone.utc) - timedelta(days=30)).replace(tzinfo=None)
-        print(f"First run fallback watermark (30 days): {watermark}")
+        # 2) First run fallback (OpenFEC can reject extremely old filters or it may be too huge)
+        if str(watermark).startswith("1900-01-01"):
+            watermark = (datetime.now(timezone.utc) - timedelta(days=30)).replace(tzinfo=None)
+            print(f"First run fallback watermark (30 days): {watermark}")
 
-    try:
-        # 3) Fetch using KEYSET pagination
-        rows = fetch_schedule_a_keyset(min_load_date=watermark, per_page=100, max_batches=5)
-
-        # 4) Insert to RAW
-        inserted = insert_raw_schedule_a(rows)
-
-        # 5) Update watermark to latest load_date from fetched rows
-        new_watermark = compute_new_watermark(rows, watermark)
-
-        # 6) Log success
-        log_run("SUCCESS", new_watermark, inserted, notes="Schedule A keyset load (max_batches=5)")
-        print(f"Fetched: {len(rows)} | Inserted: {inserted} | New watermark: {new_watermark}")
-
-    except Exception as e:
-        log_run("FAILED", watermark, 0, notes=str(e)[:500])
-        raise
+        try:
+            # 3) Fetch using KEYSET pagination and insert to RAW as batches arrive
+            fetched, inserted, new_watermark = asyncio.run(load_schedule_a(conn, watermark))
+
+            # 4) Log success
+            log_run(
+                conn,
+                "SUCCESS",
+                new_watermark,
+                inserted,
+                notes=f"Schedule A keyset load ({SHARDS} shards)",
+            )
+            print(f"Fetched: {fetched} | Inserted: {inserted} | New watermark: {new_watermark}")
+
+        except Exception as e:
+            conn.rollback()
+            log_run(conn, "FAILED", watermark, 0, notes=str(e)[:500])
+            conn.commit()
+            raise
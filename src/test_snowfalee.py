@@ -1,20 +1,7 @@
 import os
-from dotenv import load_dotenv
-import snowflake.connector
 
-load_dotenv()
+from load_raw import sf_conn
 
-conn = snowflake.connector.connect(
-    account=os.getenv("SNOWFLAKE_ACCOUNT"),
-    user=os.getenv("SNOWFLAKE_USER"),
-    password=os.getenv("SNOWFLAKE_PASSWORD"),
-    role=os.getenv("SNOWFLAKE_ROLE"),
-    warehouse=os.getenv("SNOWFLAKE_WAREHOUSE"),
-    database=os.getenv("SNOWFLAKE_DATABASE"),
-    schema=os.getenv("SNOWFLAKE_SCHEMA"),
-)
-cur = conn.cursor()
-cur.execute("SELECT CURRENT_ROLE(), CURRENT_DATABASE(), CURRENT_SCHEMA(), CURRENT_WAREHOUSE()")
-print(cur.fetchone())
-cur.close()
-conn.close()
+with sf_conn(schema=os.getenv("SNOWFLAKE_SCHEMA")) as conn, conn.cursor() as cur:
+    cur.execute("SELECT CURRENT_ROLE(), CURRENT_DATABASE(), CURRENT_SCHEMA(), CURRENT_WAREHOUSE()")
+    print(cur.fetchone())